@@ -0,0 +1,111 @@
+"""
+Per-record MedlineCitation parsing for parse_pubmed_local.py.
+
+Kept as plain Python so it runs as-is, but written to be compiled by Cython
+(`cythonize -3 -i parse_pubmed_cy.py`). When the compiled extension sits next
+to this file it is imported in preference to the .py source.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+# Compiled once at import; all paths are relative to a MedlineCitation element
+_XP_PMID = etree.XPath("PMID")
+_XP_TITLE = etree.XPath("Article/ArticleTitle")
+_XP_ABS = etree.XPath("Article/Abstract/AbstractText")
+_XP_ABS_FALLBACK = etree.XPath("Article/Abstract")
+_XP_MESH_DESC = etree.XPath("MeshHeadingList/MeshHeading/DescriptorName[1]")
+_XP_KW = etree.XPath(".//KeywordList/Keyword")
+
+
+def _stringify(node: Optional[etree._Element]) -> str:
+    if node is None:
+        return ""
+    if len(node) == 0:
+        # text-only element (most titles/abstracts): no itertext() walk needed
+        return (node.text or "").strip()
+    # one strip() per fragment; parts are non-empty and stripped, so no outer strip()
+    return " ".join([s for t in node.itertext() if (s := t.strip())])
+
+
+def parse_mesh_terms(medline: etree._Element) -> str:
+    out: List[str] = []
+    for d in _XP_MESH_DESC(medline):
+        ui = d.get("UI") or ""
+        txt = (d.text or "").strip()
+        if ui and txt:
+            out.append(f"{ui}:{txt}")
+        elif txt:
+            out.append(txt)
+    return "; ".join(out)
+
+
+def parse_pmid(medline: etree._Element) -> str:
+    pmids = _XP_PMID(medline)
+    if pmids and pmids[0].text:
+        return pmids[0].text.strip()
+    # fallback
+    article_ids = medline.find("PubmedData/ArticleIdList")
+    if article_ids is not None:
+        x = article_ids.find('ArticleId[@IdType="pubmed"]')
+        if x is not None and x.text:
+            return x.text.strip()
+    return ""
+
+
+def parse_keywords(medline: etree._Element) -> List[str]:
+    kws: List[str] = []
+    for kw in _XP_KW(medline):
+        t = (kw.text or "").strip()
+        if t:
+            kws.append(t)
+    return kws
+
+
+def _title_abstract(medline: etree._Element) -> Tuple[str, str]:
+    titles = _XP_TITLE(medline)
+    title = _stringify(titles[0]) if titles else ""
+
+    abs_texts = _XP_ABS(medline)
+    if abs_texts:
+        if len(abs_texts) > 1:
+            parts: List[str] = []
+            for a in abs_texts:
+                label = a.get("Label") or a.get("NlmCategory")
+                if label and label != "UNASSIGNED":
+                    parts.append(label)
+                parts.append(_stringify(a))
+            abstract = "\n".join([p for p in parts if p]).strip()
+        else:
+            abstract = _stringify(abs_texts[0])
+    else:
+        abstracts = _XP_ABS_FALLBACK(medline)
+        abstract = _stringify(abstracts[0]) if abstracts else ""
+
+    return title, abstract
+
+
+def parse_title_abstract(medline: etree._Element) -> Dict[str, str]:
+    title, abstract = _title_abstract(medline)
+    return {"title": title, "abstract": abstract}
+
+
+def parse_article_record(medline: etree._Element, pmid: Optional[str] = None) -> Optional[Dict]:
+    if pmid is None:
+        pmid = parse_pmid(medline)
+    if not pmid:
+        return None
+    # orjson on this dict measured faster than splicing per-field dumps into a JSON template
+    title, abstract = _title_abstract(medline)
+    return {
+        "pmid": pmid,
+        "docno": pmid,  # PyTerrier-friendly
+        "title": title,
+        "abstract": abstract,
+        "mesh_terms": parse_mesh_terms(medline),
+        "keywords": parse_keywords(medline),
+        "is_deleted": False,
+    }
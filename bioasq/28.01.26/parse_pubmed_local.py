@@ -4,6 +4,7 @@ Parse local PubMed *.xml.gz files into JSONL shards (1 xml.gz -> 1 jsonl).
 
 Input: a directory containing .xml.gz files (e.g. baseline/ or updatefiles/)
 Output: a directory for .jsonl files, same filenames except .jsonl
+        (.jsonl.zst / .jsonl.gz with --compress zst / gz)
 
 Extracted fields per line:
 - pmid (str)
@@ -15,177 +16,280 @@ Extracted fields per line:
 - is_deleted (bool)   # True for DeleteCitation tombstones
 
 Requirements:
-    pip install lxml pubmed-parser
+    pip install lxml
+    pip install isal orjson cython  # optional, faster gzip / JSON / compiled parsers
+    pip install zstandard  # only for --compress zst
 """
 
 from __future__ import annotations
 
 import argparse
-import gzip
+import io
 import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from lxml import etree
 
+# Per-record parsers live in parse_pubmed_cy so they can be compiled with Cython;
+# the compiled extension is picked up automatically when present.
+from parse_pubmed_cy import (  # noqa: F401
+    parse_article_record,
+    parse_keywords,
+    parse_mesh_terms,
+    parse_pmid,
+    parse_title_abstract,
+)
+
 try:
-    import pubmed_parser as pp
+    # ISA-L backed drop-in for gzip; much faster inflate than stdlib zlib
+    from isal import igzip as gzip_mod
+
+    _HAVE_ISAL = True
+    _GZIP_LEVEL = 2  # ISA-L levels are 0-3
 except Exception:
-    pp = None
+    import gzip as gzip_mod
 
+    _HAVE_ISAL = False
+    _GZIP_LEVEL = 6
 
-def _stringify(node: Optional[etree._Element]) -> str:
-    if node is None:
-        return ""
-    if pp is not None:
-        try:
-            return (pp.utils.stringify_children(node) or "").strip()
-        except Exception:
-            pass
-    return " ".join(t.strip() for t in node.itertext() if t and t.strip()).strip()
-
-
-def parse_mesh_terms(medline: etree._Element) -> str:
-    mesh_list = medline.find("MeshHeadingList")
-    if mesh_list is None:
-        return ""
-    out: List[str] = []
-    for mh in mesh_list.findall("MeshHeading"):
-        d = mh.find("DescriptorName")
-        if d is None:
-            continue
-        ui = d.attrib.get("UI", "") or ""
-        txt = (d.text or "").strip()
-        if ui and txt:
-            out.append(f"{ui}:{txt}")
-        elif txt:
-            out.append(txt)
-    return "; ".join(out)
-
-
-def parse_pmid(medline: etree._Element) -> str:
-    pmid = medline.find("PMID")
-    if pmid is not None and pmid.text:
-        return pmid.text.strip()
-    # fallback
-    article_ids = medline.find("PubmedData/ArticleIdList")
-    if article_ids is not None:
-        x = article_ids.find('ArticleId[@IdType="pubmed"]')
-        if x is not None and x.text:
-            return x.text.strip()
-    return ""
-
-
-def parse_keywords(medline: etree._Element) -> List[str]:
-    if pp is not None:
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+except Exception:
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+# Large reads amortize per-call overhead in zlib and lxml's small internal reads
+READ_BUFFER_SIZE = 1024 * 1024
+# Records are accumulated and flushed in bulk to keep write() calls per shard low
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# --compress choice -> output file suffix
+OUTPUT_SUFFIXES = {"none": ".jsonl", "zst": ".jsonl.zst", "gz": ".jsonl.gz"}
+
+# Without isal, pipe through an external decompressor (if installed) rather than stdlib zlib.
+# With isal, inflate stays in-process: it is faster than pigz and adds no extra process per worker.
+_GUNZIP_CMD: Optional[List[str]] = None
+if not _HAVE_ISAL:
+    _GUNZIP_CMD = next(([exe, "-dc"] for exe in ("igzip", "pigz") if shutil.which(exe)), None)
+
+
+def _fadvise(fh: BinaryIO, advice: str) -> None:
+    """Best-effort page cache hint for the whole file; no-op where unsupported (e.g. macOS)."""
+    flag = getattr(os, advice, None)
+    if flag is None:
+        return
+    try:
+        os.posix_fadvise(fh.fileno(), 0, 0, flag)
+    except OSError:
+        pass
+
+
+def _prefetch(path: Path) -> None:
+    """Start asynchronous kernel readahead of a shard that will be parsed soon."""
+    try:
+        with open(path, "rb") as fh:
+            _fadvise(fh, "POSIX_FADV_WILLNEED")
+    except OSError:
+        pass
+
+
+@contextmanager
+def _open_xml_stream(gz_path: Path, drop_cache: bool = True) -> Iterator[BinaryIO]:
+    """
+    Yields the decompressed XML byte stream of gz_path.
+    Decompresses in-process with isal; without it, pipes through igzip/pigz when available.
+    drop_cache=False keeps the shard in the page cache for a following pass.
+    """
+    with open(gz_path, "rb") as src:
+        # shards are read once, front to back: ask for aggressive readahead,
+        # then drop them from the page cache so ~1500 shards don't evict everything else
+        _fadvise(src, "POSIX_FADV_SEQUENTIAL")
         try:
-            kws = pp.medline_parser.parse_keywords(medline)
-            # pubmed_parser sometimes returns None
-            return kws if kws is not None else []
-        except Exception:
-            pass
-
-    kws: List[str] = []
-    for kw in medline.findall(".//KeywordList/Keyword"):
-        t = (kw.text or "").strip()
-        if t:
-            kws.append(t)
-    return kws
-
-
-def parse_title_abstract(medline: etree._Element) -> Dict[str, str]:
-    article = medline.find("Article")
-    if article is None:
-        return {"title": "", "abstract": ""}
-
-    title = _stringify(article.find("ArticleTitle"))
-
-    abs_texts = article.findall("Abstract/AbstractText")
-    if abs_texts:
-        if len(abs_texts) > 1:
-            parts: List[str] = []
-            for a in abs_texts:
-                label = a.attrib.get("Label", "") or a.attrib.get("NlmCategory", "")
-                if label and label != "UNASSIGNED":
-                    parts.append(label)
-                parts.append(_stringify(a))
-            abstract = "\n".join([p for p in parts if p]).strip()
-        else:
-            abstract = _stringify(abs_texts[0])
-    else:
-        abstract = _stringify(article.find("Abstract"))
-
-    return {"title": title, "abstract": abstract}
-
-
-def parse_article_record(medline: etree._Element) -> Optional[Dict]:
-    pmid = parse_pmid(medline)
-    if not pmid:
-        return None
-    ta = parse_title_abstract(medline)
-    return {
-        "pmid": pmid,
-        "docno": pmid,  # PyTerrier-friendly
-        "title": ta["title"],
-        "abstract": ta["abstract"],
-        "mesh_terms": parse_mesh_terms(medline),
-        "keywords": parse_keywords(medline),
-        "is_deleted": False,
-    }
-
-
-def iter_records_from_xml_gz(gz_path: Path) -> Iterable[Dict]:
+            proc = None
+            if _GUNZIP_CMD is not None:
+                try:
+                    proc = subprocess.Popen(
+                        _GUNZIP_CMD, stdin=src, stdout=subprocess.PIPE, bufsize=READ_BUFFER_SIZE
+                    )
+                except OSError:
+                    proc = None
+
+            if proc is None:
+                with gzip_mod.open(src, "rb") as raw, io.BufferedReader(raw, buffer_size=READ_BUFFER_SIZE) as fh:
+                    yield fh
+                return
+
+            try:
+                yield proc.stdout
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+            if returncode != 0:
+                raise RuntimeError(f"{_GUNZIP_CMD[0]} failed on {gz_path} (exit code {returncode})")
+        finally:
+            if drop_cache:
+                _fadvise(src, "POSIX_FADV_DONTNEED")
+
+
+_CITATION_TAGS = ("MedlineCitation", "DeleteCitation")
+
+def _iter_citations(fh: BinaryIO) -> Iterator[etree._Element]:
+    """Yields each completed MedlineCitation / DeleteCitation element of fh."""
+    # tag= filters in libxml2, so Python only sees the elements it handles
+    context = etree.iterparse(fh, events=("end",), tag=_CITATION_TAGS, recover=True, huge_tree=True)
+    for _, elem in context:
+        yield elem
+
+
+def _release(elem: etree._Element) -> None:
+    """
+    Free a fully processed element: clear it and drop the already-processed
+    siblings before it (and before each of its ancestors), so the tree built
+    by iterparse stays small instead of growing with the whole shard.
+    """
+    elem.clear()
+    node = elem
+    parent = node.getparent()
+    while parent is not None:
+        while node.getprevious() is not None:
+            del parent[0]
+        node, parent = parent, parent.getparent()
+
+
+def _deleted_pmids(delete_citation: etree._Element) -> List[str]:
+    pmids: List[str] = []
+    for pmid_node in delete_citation.findall("PMID"):
+        if pmid_node.text and pmid_node.text.strip():
+            pmids.append(pmid_node.text.strip())
+    return pmids
+
+
+def _scan_deleted_pmids(gz_path: Path) -> Set[str]:
+    """
+    First pass over an update shard: collect the PMIDs its DeleteCitation removes.
+    DeleteCitation sits at the end of the file, so this needs its own read.
+    """
+    deleted: Set[str] = set()
+    # keep the shard cached: the main pass reads it again right away
+    with _open_xml_stream(gz_path, drop_cache=False) as fh:
+        for elem in _iter_citations(fh):
+            if elem.tag == "DeleteCitation":
+                deleted.update(_deleted_pmids(elem))
+            _release(elem)
+    return deleted
+
+
+def iter_records_from_xml_gz(gz_path: Path, skip_deleted: bool = False) -> Iterable[Dict]:
     """
     Yields MedlineCitation records and DeleteCitation tombstones.
     DeleteCitation mostly appears in updatefiles.
+
+    With skip_deleted, the shard is pre-scanned for DeleteCitation and citations
+    deleted in the same shard are skipped without parsing; only their tombstone is emitted.
     """
-    parser = etree.XMLParser(recover=True, huge_tree=True)
-    with gzip.open(gz_path, "rb") as fh:
-        for _, elem in etree.iterparse(fh, events=("end",)):
+    deleted = _scan_deleted_pmids(gz_path) if skip_deleted else set()
+    with _open_xml_stream(gz_path) as fh:
+        for elem in _iter_citations(fh):
             if elem.tag == "MedlineCitation":
-                rec = parse_article_record(elem)
-                if rec is not None:
-                    yield rec
-                elem.clear()
-
-            elif elem.tag == "DeleteCitation":
-                for pmid_node in elem.findall("PMID"):
-                    if pmid_node.text and pmid_node.text.strip():
-                        pmid = pmid_node.text.strip()
-                        yield {
-                            "pmid": pmid,
-                            "docno": pmid,
-                            "title": "",
-                            "abstract": "",
-                            "mesh_terms": "",
-                            "keywords": [],
-                            "is_deleted": True,
-                        }
-                elem.clear()
+                pmid = parse_pmid(elem)
+                # citations deleted later in this shard are skipped without parsing
+                if pmid not in deleted:
+                    rec = parse_article_record(elem, pmid)
+                    if rec is not None:
+                        yield rec
 
             else:
-                # memory hygiene
-                if len(elem) > 1000:
-                    elem.clear()
-
-
-def xml_gz_to_jsonl(gz_path: Path, jsonl_path: Path) -> None:
+                for pmid in _deleted_pmids(elem):
+                    yield {
+                        "pmid": pmid,
+                        "docno": pmid,
+                        "title": "",
+                        "abstract": "",
+                        "mesh_terms": "",
+                        "keywords": [],
+                        "is_deleted": True,
+                    }
+
+            _release(elem)
+
+
+def _compressed_writer(raw: BinaryIO, compress: str, out_path: Path):
+    if compress == "zst":
+        # single-threaded: the process pool already keeps every core busy
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    if compress == "gz":
+        # name the header after the final file (not raw's .partial name), as gzip itself would
+        return gzip_mod.GzipFile(filename=out_path.stem, mode="wb", fileobj=raw, compresslevel=_GZIP_LEVEL)
+    return nullcontext(raw)
+
+
+def xml_gz_to_jsonl(gz_path: Path, jsonl_path: Path, skip_deleted: bool = False, compress: str = "none") -> None:
     jsonl_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = jsonl_path.with_suffix(".jsonl.partial")
-    with open(tmp, "w", encoding="utf-8") as out:
-        for rec in iter_records_from_xml_gz(gz_path):
-            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    tmp = jsonl_path.with_name(jsonl_path.name + ".partial")
+    buf = bytearray()
+    with open(tmp, "wb") as raw, _compressed_writer(raw, compress, jsonl_path) as out:
+        for rec in iter_records_from_xml_gz(gz_path, skip_deleted=skip_deleted):
+            buf += _dumps(rec)
+            buf += b"\n"
+            if len(buf) >= WRITE_BUFFER_SIZE:
+                out.write(buf)
+                buf.clear()
+        if buf:
+            out.write(buf)
     tmp.replace(jsonl_path)
 
 
+def _worker(
+    pair: Tuple[Path, Path],
+    skip_deleted: bool = False,
+    compress: str = "none",
+    prefetch: Optional[Path] = None,
+) -> str:
+    gz_path, jsonl_path = pair
+    if prefetch is not None:
+        # page cache is shared, so the worker that later picks this shard up reads it warm
+        _prefetch(prefetch)
+    xml_gz_to_jsonl(gz_path, jsonl_path, skip_deleted=skip_deleted, compress=compress)
+    return gz_path.name
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--input_dir", required=True, help="Folder containing *.xml.gz files (baseline or updatefiles).")
     ap.add_argument("--output_dir", required=True, help="Folder to write *.jsonl shards.")
+    ap.add_argument(
+        "--compress",
+        choices=sorted(OUTPUT_SUFFIXES),
+        default="none",
+        help="Compress output shards (zst needs the zstandard package). Default: none",
+    )
     ap.add_argument("--glob", default="*.xml.gz", help="Glob pattern. Default: *.xml.gz")
     ap.add_argument("--skip_existing", action="store_true", help="Skip if corresponding JSONL exists.")
     ap.add_argument("--max_files", type=int, default=None, help="Parse only first N files (debug).")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel worker processes. Default: CPU count.")
+    ap.add_argument(
+        "--skip_deleted",
+        action="store_true",
+        help="Pre-scan each shard for DeleteCitation and skip parsing citations deleted in the same shard "
+        "(costs a second decompression pass; meant for updatefiles).",
+    )
     args = ap.parse_args()
+    if args.compress == "zst" and zstandard is None:
+        ap.error("--compress zst requires the zstandard package (pip install zstandard)")
 
     in_dir = Path(args.input_dir)
     out_dir = Path(args.output_dir)
@@ -197,13 +301,35 @@ def main():
 
     print(f"[INFO] Found {len(files)} files in {in_dir}")
 
+    pairs: List[Tuple[Path, Path]] = []
     for gz_path in files:
-        jsonl_path = out_dir / gz_path.name.replace(".xml.gz", ".jsonl")
+        jsonl_path = out_dir / gz_path.name.replace(".xml.gz", OUTPUT_SUFFIXES[args.compress])
         if args.skip_existing and jsonl_path.exists() and jsonl_path.stat().st_size > 0:
             print(f"[SKIP] {gz_path.name}")
             continue
-        print(f"[PARSE] {gz_path.name} -> {jsonl_path.name}")
-        xml_gz_to_jsonl(gz_path, jsonl_path)
+        pairs.append((gz_path, jsonl_path))
+
+    # 1 xml.gz -> 1 jsonl, so shards are independent; each worker writes its own .partial
+    workers = max(1, args.workers)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {}
+        for i, pair in enumerate(pairs):
+            # shards run in submission order, so the one `workers` slots ahead is next up when this finishes
+            ahead = pairs[i + workers][0] if i + workers < len(pairs) else None
+            futures[ex.submit(_worker, pair, args.skip_deleted, args.compress, ahead)] = pair
+        try:
+            for i, fut in enumerate(as_completed(futures), 1):
+                gz_path, jsonl_path = futures[fut]
+                if fut.exception() is not None:
+                    print(f"[FAIL] {gz_path.name}")
+                fut.result()
+                print(f"[PARSE] ({i}/{len(pairs)}) {gz_path.name} -> {jsonl_path.name}")
+        except BaseException:
+            # stop at the first failure instead of draining the rest of the queue on exit;
+            # wait here, as a later shutdown() from the with-block would reset cancel_futures
+            print("[FAIL] cancelling remaining shards")
+            ex.shutdown(wait=True, cancel_futures=True)
+            raise
 
     print("[DONE]")
 
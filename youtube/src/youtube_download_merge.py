@@ -1,4 +1,5 @@
 import argparse
+import functools
 import os
 import subprocess
 import sys
@@ -12,16 +13,63 @@ def run_ffmpeg(args):
     print("Running:", " ".join(args))
     subprocess.run(args, check=True)
 
+# Hardware H.264 encoders in order of preference, with their encoder-specific options.
+# Explicit quality targets roughly matching libx264's CRF 23; their default bitrates are far lower.
+HW_ENCODERS = {
+    "h264_nvenc": ["-preset", "p4", "-rc", "vbr", "-cq", "23", "-b:v", "0"],
+    "h264_videotoolbox": ["-q:v", "65"],
+    "h264_qsv": ["-preset", "medium", "-global_quality", "23"],
+}
+
+@functools.lru_cache(maxsize=None)
+def pick_video_encoder():
+    """Return the first hardware H.264 encoder that actually works here, else libx264."""
+    try:
+        listed = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                capture_output=True, text=True).stdout
+    except OSError:
+        return "libx264"
+    for name in HW_ENCODERS:
+        if name not in listed:
+            continue
+        # Builds often list encoders whose hardware/driver is missing, so try one frame
+        # with the same options the real encode uses
+        probe = subprocess.run([
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "color=size=256x256:duration=0.1",
+            "-frames:v", "1", *video_encoder_args(name), "-f", "null", "-"
+        ], capture_output=True)
+        if probe.returncode == 0:
+            return name
+    return "libx264"
+
+def video_encoder_args(encoder):
+    return ["-c:v", encoder] + HW_ENCODERS.get(encoder, [])
+
+def convert_cmd(inputs, encoder, output_mov):
+    return [
+        "ffmpeg", "-y",
+        *inputs,
+        *video_encoder_args(encoder),
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_mov
+    ]
+
 def main():
     p = argparse.ArgumentParser(
         description=("Download 1080p video+audio with yt-dlp. "
                      "Default: no re-encode (copy). "
                      "--remux: rewrap to .mov (no re-encode). "
-                     "--convert: re-encode to H.264/AAC .mov.")
+                     "--convert: re-encode to H.264/AAC .mov "
+                     "(hardware encoder when available).")
     )
     p.add_argument("url", help="YouTube URL")
     p.add_argument("--convert", action="store_true",
                    help="Re-encode to MOV (H.264/AAC) with ffmpeg")
+    p.add_argument("--encoder", default="auto",
+                   help="Video encoder for --convert (default: auto = first working "
+                        "h264_nvenc/h264_videotoolbox/h264_qsv, else libx264)")
     p.add_argument("--remux", action="store_true",
                    help="Remux to MOV (no re-encode) with ffmpeg")
     p.add_argument(
@@ -96,32 +144,29 @@ def main():
 
     # 2) Decide action based on flags and what we have
     if args.convert:
-        # Re-encode to H.264/AAC .mov from either separate streams or a single file
+        # Re-encode to H.264/AAC .mov from either separate streams or a single file.
+        # +faststart is kept: its extra pass is a plain file rewrite, cheap next to encoding,
+        # and a fragmented (empty_moov) .mov is less widely supported by players/editors.
         output_mov = f"{title}.mov"
 
         if video_path and audio_path:
-            run_ffmpeg([
-                "ffmpeg", "-y",
-                "-i", video_path,
-                "-i", audio_path,
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-movflags", "+faststart",
-                output_mov
-            ])
+            inputs = ["-i", video_path, "-i", audio_path]
         elif single_path:
-            run_ffmpeg([
-                "ffmpeg", "-y",
-                "-i", single_path,
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-movflags", "+faststart",
-                output_mov
-            ])
+            inputs = ["-i", single_path]
         else:
             print("Could not determine downloaded files to convert.", file=sys.stderr)
             sys.exit(2)
 
+        encoder = pick_video_encoder() if args.encoder == "auto" else args.encoder
+        try:
+            run_ffmpeg(convert_cmd(inputs, encoder, output_mov))
+        except subprocess.CalledProcessError:
+            # A hardware encoder can pass the probe and still fail on the real input
+            if args.encoder != "auto" or encoder == "libx264":
+                raise
+            print(f"{encoder} failed, retrying with libx264", file=sys.stderr)
+            run_ffmpeg(convert_cmd(inputs, "libx264", output_mov))
+
         print(f"Finished (converted): {output_mov}")
         return
 